@@ -1,21 +1,27 @@
 import logging
+import os
 import shutil
-import uuid
+import secrets
 import io
 import zipfile
 from pathlib import Path
-from typing import Dict, Optional
-from datetime import datetime
+from typing import Iterator, List, Optional
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import anyio
+from arq import create_pool
+from arq.connections import ArqRedis, RedisSettings
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from agent.graph import agent
-from agent.tools import init_project_root
+from agent import storage
+from agent.logging_setup import configure_logging
 
-# Configure logging
+# Configure logging here rather than only in agent.main: uvicorn's worker and
+# reload processes import this module directly
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI
@@ -34,8 +40,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage for task status (use Redis/Database in production)
-task_storage: Dict[str, Dict] = {}
+# Threadpool sizing for sync endpoints and run_in_threadpool; agent builds
+# run in separate worker processes (see agent/worker.py)
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+
+# arq connection pool used to enqueue builds, created on startup
+arq_redis: Optional[ArqRedis] = None
+
+
+@app.on_event("startup")
+async def configure_threadpool():
+    """Size the AnyIO threadpool used for sync endpoints and run_in_threadpool"""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    logger.info("Threadpool size: %d", THREADPOOL_SIZE)
+
+
+@app.on_event("startup")
+async def connect_job_queue():
+    """Open the arq connection pool used to enqueue agent builds"""
+    global arq_redis
+    arq_redis = await create_pool(RedisSettings.from_dsn(storage.REDIS_URL))
+
+
+@app.on_event("shutdown")
+async def close_storage():
+    """Close the Redis connection pools on shutdown"""
+    await storage.redis_client.aclose()
+    if arq_redis is not None:
+        await arq_redis.aclose()
 
 
 # Pydantic Models
@@ -44,7 +76,7 @@ class WebsiteRequest(BaseModel):
 
 
 class TaskResponse(BaseModel):
-    task_id: str
+    task_id: str  # URL-safe random token, e.g. "q3Zb0x_Lr9Kd-2Vw"
     status: str
     message: str
 
@@ -57,6 +89,7 @@ class TaskStatus(BaseModel):
     error: Optional[str] = None
     created_at: str
     completed_at: Optional[str] = None
+    review_status: Optional[str] = None  # Deferred reviews: "pending" until the batch finishes
 
 
 class BuildResult(BaseModel):
@@ -64,62 +97,79 @@ class BuildResult(BaseModel):
     project_path: str
     files: list
     message: str
+    review: Optional[str] = None
 
 
-# Background Task
-def run_agent_task(task_id: str, user_prompt: str):
-    """Background task to execute the agent"""
+def read_project_file(target_file: Path) -> str:
+    """Reads a generated file in a worker thread with one sized read"""
+    fd = os.open(target_file, os.O_RDONLY)
     try:
-        from agent.tools import set_project_root  # Add this import
-        
-        task_storage[task_id]["status"] = "processing"
-        task_storage[task_id]["progress"] = "planner"
-        
-        logger.info(f"Starting task {task_id}")
-        
-        # Initialize project root and SET IT for this thread
-        project_path = init_project_root()  # Now returns Path object
-        set_project_root(project_path)  # CRITICAL: Set for current thread
-        logger.info(f"Initialized project directory: {project_path}")
-        
-        # Update progress
-        task_storage[task_id]["progress"] = "architect"
-
-        # Run the agent with project_root in initial state
-        result = agent.invoke(
-            {
-                "user_prompt": user_prompt,
-                "project_root": str(project_path)
-            },
-            {"recursion_limit": 100}
-        )
+        data = os.read(fd, os.fstat(fd).st_size)
+    finally:
+        os.close(fd)
+    return data.decode('utf-8')
+
+
+# Larger buffers let zlib compress bigger chunks per call
+ZIP_BUFFER_SIZE = 256 * 1024
+ZIP_COMPRESS_LEVEL = 6
+
+# Download compression options. Generated projects are small text files, so the
+# default is no compression (a reverse proxy can gzip the stream instead).
+ZIP_COMPRESSION = {
+    "none": zipfile.ZIP_STORED,
+    "deflate": zipfile.ZIP_DEFLATED,
+}
+if hasattr(zipfile, "ZIP_ZSTANDARD"):  # Python 3.14+
+    ZIP_COMPRESSION["zstd"] = zipfile.ZIP_ZSTANDARD
+
+
+class ZipStreamBuffer(io.RawIOBase):
+    """Write-only, unseekable sink that collects ZipFile output until drained"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_project_zip(project_root: str, files: List[str], compression: int) -> Iterator[bytes]:
+    """Yields a ZIP archive of the given project files as compressed chunks"""
+    buffer = ZipStreamBuffer()
+    writer = io.BufferedWriter(buffer, buffer_size=ZIP_BUFFER_SIZE)
+    with zipfile.ZipFile(writer, 'w', compression, compresslevel=ZIP_COMPRESS_LEVEL) as zipf:
+        for arcname in files:
+            file = os.path.join(project_root, arcname)
+            zinfo = zipfile.ZipInfo.from_file(file, arcname)
+            zinfo.compress_type = zipf.compression
+            zinfo._compresslevel = zipf.compresslevel  # Same as ZipFile.write()
+            with open(file, 'rb', buffering=ZIP_BUFFER_SIZE) as src, zipf.open(zinfo, 'w') as dest:
+                shutil.copyfileobj(src, dest, ZIP_BUFFER_SIZE)
+            
+            # Only yield once the BufferedWriter has spilled into the sink
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+    
+    # Central directory is written when the archive is closed
+    writer.flush()
+    yield buffer.drain()
 
-        
-        # Get list of generated files
-        files = []
-        if project_path.exists():
-            for file in project_path.rglob("*"):
-                if file.is_file():
-                    files.append(str(file.relative_to(project_path)))
-        
-        # Update task status
-        task_storage[task_id]["status"] = "completed"
-        task_storage[task_id]["progress"] = "done"
-        task_storage[task_id]["project_path"] = str(project_path)
-        task_storage[task_id]["files"] = files
-        task_storage[task_id]["completed_at"] = datetime.now().isoformat()
-        
-        logger.info(f"Task {task_id} completed successfully")
-        
-    except Exception as e:
-        logger.error(f"Task {task_id} failed: {str(e)}", exc_info=True)
-        task_storage[task_id]["status"] = "failed"
-        task_storage[task_id]["error"] = str(e)
-        task_storage[task_id]["completed_at"] = datetime.now().isoformat()
 
 # API Endpoints
 @app.get("/")
-def root():
+async def root():
     """Health check endpoint"""
     return {
         "message": "AI Website Builder API is running",
@@ -129,7 +179,7 @@ def root():
 
 
 @app.post("/api/build-website", response_model=TaskResponse)
-async def build_website(request: WebsiteRequest, background_tasks: BackgroundTasks):
+async def build_website(request: WebsiteRequest):
     """
     Start building a website based on user prompt.
     Returns a task_id to track progress.
@@ -137,25 +187,22 @@ async def build_website(request: WebsiteRequest, background_tasks: BackgroundTas
     if not request.user_prompt or len(request.user_prompt.strip()) == 0:
         raise HTTPException(status_code=400, detail="user_prompt cannot be empty")
     
-    # Generate unique task ID
-    task_id = str(uuid.uuid4())
+    # Generate unique task ID (16 URL-safe characters, 96 bits of randomness)
+    task_id = secrets.token_urlsafe(12)
     
     # Initialize task storage
-    task_storage[task_id] = {
-        "task_id": task_id,
-        "status": "pending",
-        "progress": "initialized",
-        "user_prompt": request.user_prompt,
-        "created_at": datetime.now().isoformat(),
-        "project_path": None,
-        "files": [],
-        "error": None
-    }
+    await storage.create_task(storage.TaskRecord(
+        task_id=task_id,
+        status="pending",
+        progress="initialized",
+        user_prompt=request.user_prompt,
+        created_at=storage.now_iso()
+    ))
     
-    # Add background task
-    background_tasks.add_task(run_agent_task, task_id, request.user_prompt)
+    # Hand the build to a worker process
+    await arq_redis.enqueue_job("run_agent_task", task_id, request.user_prompt)
     
-    logger.info(f"Created task {task_id} for prompt: {request.user_prompt[:100]}...")
+    logger.info("Created task %s for prompt: %s...", task_id, request.user_prompt[:100])
     
     return TaskResponse(
         task_id=task_id,
@@ -164,143 +211,138 @@ async def build_website(request: WebsiteRequest, background_tasks: BackgroundTas
     )
 
 
+async def get_task_or_404(task_id: str) -> storage.TaskRecord:
+    """Load a task record from storage or raise a 404"""
+    task = await storage.get_task(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
+
+
 @app.get("/api/status/{task_id}", response_model=TaskStatus)
-def get_task_status(task_id: str):
+async def get_task_status(task_id: str):
     """Get the status of a build task"""
-    if task_id not in task_storage:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    task = task_storage[task_id]
+    task = await get_task_or_404(task_id)
     return TaskStatus(
-        task_id=task["task_id"],
-        status=task["status"],
-        progress=task["progress"],
-        project_path=task.get("project_path"),
-        error=task.get("error"),
-        created_at=task["created_at"],
-        completed_at=task.get("completed_at")
+        task_id=task.task_id,
+        status=task.status,
+        progress=task.progress,
+        project_path=task.project_path,
+        error=task.error,
+        created_at=task.created_at,
+        completed_at=task.completed_at,
+        review_status=task.review_status
     )
 
 
 @app.get("/api/result/{task_id}", response_model=BuildResult)
-def get_build_result(task_id: str):
+async def get_build_result(task_id: str):
     """Get the final result of a completed build"""
-    if task_id not in task_storage:
-        raise HTTPException(status_code=404, detail="Task not found")
+    task = await get_task_or_404(task_id)
     
-    task = task_storage[task_id]
-    
-    if task["status"] != "completed":
+    if task.status != "completed":
         raise HTTPException(
             status_code=400, 
-            detail=f"Task is not completed yet. Current status: {task['status']}"
+            detail=f"Task is not completed yet. Current status: {task.status}"
         )
     
     return BuildResult(
         status="success",
-        project_path=task["project_path"],
-        files=task.get("files", []),
-        message="Website generated successfully"
+        project_path=task.project_path,
+        files=await storage.get_files(task_id),
+        message="Website generated successfully",
+        review=task.review
     )
 
 
 @app.get("/api/download/{task_id}")
-def download_project(task_id: str):
-    """Download the generated project as a ZIP file"""
-    if task_id not in task_storage:
-        raise HTTPException(status_code=404, detail="Task not found")
+async def download_project(task_id: str, compress: str = "none"):
+    """Download the generated project as a ZIP file (compress: none, deflate or zstd)"""
+    if compress not in ZIP_COMPRESSION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported compression '{compress}'. Options: {', '.join(ZIP_COMPRESSION)}"
+        )
     
-    task = task_storage[task_id]
+    task = await get_task_or_404(task_id)
     
-    if task["status"] != "completed":
+    if task.status != "completed":
         raise HTTPException(
             status_code=400,
             detail="Project is not ready for download yet"
         )
     
-    project_path = Path(task["project_path"])
+    project_path = Path(task.project_path)
     
     if not project_path.exists():
         raise HTTPException(status_code=404, detail="Project directory not found")
     
-    # Create ZIP in memory
-    memory_file = io.BytesIO()
-    with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for file in project_path.rglob("*"):
-            if file.is_file():
-                arcname = file.relative_to(project_path)
-                zipf.write(file, arcname)
-    
-    memory_file.seek(0)
+    files = await storage.get_files(task_id)
     
+    # Stream the ZIP as it is built; Starlette iterates sync generators in the threadpool
     return StreamingResponse(
-        memory_file,
+        iter_project_zip(str(project_path), files, ZIP_COMPRESSION[compress]),
         media_type="application/zip",
         headers={"Content-Disposition": f"attachment; filename=website_{task_id}.zip"}
     )
 
 
 @app.get("/api/file/{task_id}/{file_path:path}")
-def get_file_content(task_id: str, file_path: str):
+async def get_file_content(task_id: str, file_path: str):
     """Get the content of a specific file from the generated project"""
-    if task_id not in task_storage:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    task = task_storage[task_id]
+    task = await get_task_or_404(task_id)
     
-    if task["status"] != "completed":
+    if task.status != "completed":
         raise HTTPException(status_code=400, detail="Project is not ready yet")
     
-    project_path = Path(task["project_path"])
-    target_file = project_path / file_path
-    
-    if not target_file.exists() or not target_file.is_file():
-        raise HTTPException(status_code=404, detail="File not found")
+    # Root is resolved once when the build finishes; older records fall back to resolving here
+    resolved_root = task.resolved_project_path or os.path.realpath(task.project_path)
+    target_file = Path(os.path.realpath(os.path.join(resolved_root, file_path)))
     
     # Security check: ensure file is within project directory
-    if not str(target_file.resolve()).startswith(str(project_path.resolve())):
+    if os.path.commonpath([resolved_root, target_file]) != resolved_root:
         raise HTTPException(status_code=403, detail="Access denied")
     
+    if not target_file.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+    
     try:
-        with open(target_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = await run_in_threadpool(read_project_file, target_file)
         return {"file_path": file_path, "content": content}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
 
 
 @app.delete("/api/task/{task_id}")
-def delete_task(task_id: str):
+async def delete_task(task_id: str):
     """Delete a task and its associated project files"""
-    if task_id not in task_storage:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    task = task_storage[task_id]
+    task = await get_task_or_404(task_id)
     
     # Delete project directory if it exists
-    if task.get("project_path"):
-        project_path = Path(task["project_path"])
+    if task.project_path:
+        project_path = Path(task.project_path)
         if project_path.exists():
-            shutil.rmtree(project_path)
-            logger.info(f"Deleted project directory: {project_path}")
+            await run_in_threadpool(shutil.rmtree, project_path)
+            logger.info("Deleted project directory: %s", project_path)
     
     # Remove from storage
-    del task_storage[task_id]
+    await storage.delete_task(task_id)
     
     return {"message": "Task deleted successfully", "task_id": task_id}
 
 
 @app.get("/api/tasks")
-def list_tasks():
+async def list_tasks():
     """List all tasks (for debugging/admin)"""
+    summaries = await storage.list_task_summaries()
     return {
-        "total_tasks": len(task_storage),
+        "total_tasks": len(summaries),
         "tasks": [
             {
                 "task_id": task_id,
-                "status": task["status"],
-                "created_at": task["created_at"]
+                "status": status,
+                "created_at": created_at
             }
-            for task_id, task in task_storage.items()
+            for task_id, status, created_at in summaries
         ]
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,56 @@
+# =============================================================================
+# SEMANTIC CACHE MODULE
+# =============================================================================
+# This module provides an in-memory embedding-similarity cache.
+# Maps to: Reusing an earlier LLM response when a new request means the same
+# thing as a cached one ("todo app with auth" / "todo list with login"), where
+# the exact-match node cache would miss.
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """Maps request embeddings to cached responses; a lookup returns the most similar
+    entry in the same namespace if its cosine similarity reaches the threshold."""
+
+    def __init__(self, threshold: float, max_entries: int = 1024):
+        self.threshold = threshold
+        self.max_entries = max_entries  # Per namespace; the oldest entries are dropped first
+        self._lock = threading.Lock()
+        # namespace -> (N x D matrix of unit-length embeddings, N cached values)
+        self._entries: Dict[str, Tuple[np.ndarray, List[str]]] = {}
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, embedding: Sequence[float], namespace: str = "") -> Optional[str]:
+        """Returns the cached value closest to embedding, or None if nothing is similar enough."""
+        query = self._normalize(embedding)
+        with self._lock:
+            entry = self._entries.get(namespace)
+            if entry is None:
+                return None
+            matrix, values = entry
+            # Cosine similarity against every cached embedding in one matrix-vector product
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            return values[best] if scores[best] >= self.threshold else None
+
+    def add(self, embedding: Sequence[float], value: str, namespace: str = "") -> None:
+        """Caches value under embedding."""
+        row = self._normalize(embedding)[np.newaxis, :]
+        with self._lock:
+            entry = self._entries.get(namespace)
+            if entry is None:
+                self._entries[namespace] = (row, [value])
+                return
+            matrix, values = entry
+            self._entries[namespace] = (
+                np.vstack((matrix, row))[-self.max_entries:],
+                (values + [value])[-self.max_entries:],
+            )
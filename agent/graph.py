@@ -1,646 +1,512 @@
+import functools
+import hashlib
 import logging
 import json
+import os
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple
+
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from pydantic import TypeAdapter
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import create_react_agent
+from langgraph.types import CachePolicy, Send
 
+from agent.logging_setup import configure_logging
 from agent.prompts import *
 from agent.states import *
-from agent.tools import write_file, read_file, get_current_directory, list_files
+from agent.tools import (
+    write_file, read_file, get_current_directory, list_files,
+    get_project_root, get_project_root_resolved, set_project_root,
+)
 
 # Load environment variables
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('agent_execution.log'),
-        logging.StreamHandler()
-    ]
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Initialize different LLMs for different tasks
-# Use gpt-4o for strategic planning, gpt-4o-mini for coding (cost optimization)
-planner_llm = ChatOpenAI(
-    model="gpt-4o",  # More creative and comprehensive planning
-    temperature=0.8,
-)
+# LLM clients are created on first use: langchain_openai, httpx and the React
+# agent prebuilt are slow to import, so importing this module stays cheap.
 
-architect_llm = ChatOpenAI(
-    model="gpt-4o",  # Better at breaking down complex structures
-    temperature=0.7,
-)
 
-coder_llm = ChatOpenAI(
-    model="gpt-4o-mini",  # Fast and efficient for code generation
-    temperature=0.6,
-)
+def build_once(getter):
+    """Caches a zero-argument getter's result per process. Unlike functools.cache, parallel
+    first calls (e.g. from concurrent coder branches) wait for one build instead of each
+    building, and leaking, their own client"""
+    lock = threading.Lock()
+    built = []
 
-reviewer_llm = ChatOpenAI(
-    model="gpt-4o",  # Critical eye for quality review
-    temperature=0.5,
-)
+    @functools.wraps(getter)
+    def get():
+        if not built:
+            with lock:
+                if not built:
+                    built.append(getter())
+        return built[0]
 
+    return get
 
-# Agent Functions
-def planner_agent(state: dict) -> dict:
-    """Converts user prompt into a structured Plan with design excellence"""
-    logger.info("=== PLANNER AGENT STARTED ===")
-    user_prompt = state["user_prompt"]
-    logger.info(f"User prompt: {user_prompt}")
-    
-    # Detect styling framework preference
-    framework = "custom modern css"
-    if "tailwind" in user_prompt.lower():
-        framework = "TailwindCSS via CDN"
-    elif "bootstrap" in user_prompt.lower():
-        framework = "Bootstrap 5 via CDN"
-    
-    # Enhanced prompt with design guidelines
-    enhanced_prompt = f"""
-{planner_prompt(user_prompt)}
-
-DESIGN EXCELLENCE REQUIREMENTS (Lovable.dev Quality Standards):
-
-1. VISUAL DESIGN - STUNNING & PROFESSIONAL:
-   - Beautiful, modern aesthetic that makes users say "WOW!"
-   - Rich, vibrant color schemes with gradients and depth
-   - Professional background colors (NOT plain white - use subtle gradients, patterns, or colors)
-   - Proper visual hierarchy with clear focal points
-   - Generous white space and breathing room
-   - Contemporary UI patterns: glassmorphism, neumorphism, subtle shadows
-   - Smooth animations and transitions on hover/interaction
-   - Premium feel with attention to micro-details
-
-2. LAYOUT & RESPONSIVENESS:
-   - Mobile-first responsive design
-   - Use CSS Grid for page layouts
-   - Use Flexbox for component layouts
-   - Breakpoints: mobile (< 640px), tablet (640-1024px), desktop (> 1024px)
-   - Smooth transitions between breakpoints
-
-3. TYPOGRAPHY:
-   - Readable font sizes (16px base minimum)
-   - Proper line heights (1.5-1.7 for body text)
-   - Font hierarchy (h1: 2.5rem, h2: 2rem, h3: 1.5rem, etc.)
-   - Consider Google Fonts for modern typography
-   - Good contrast ratios (WCAG AA compliant)
-
-4. COLORS & THEMING - BEAUTIFUL PALETTES:
-   - Use CSS custom properties (variables) for easy theming
-   - Rich color palette: primary, secondary, accent, neutral, success, error
-   - Background colors: Use gradients, subtle patterns, or rich colors (NO plain white!)
-   - Example beautiful backgrounds:
-     * Linear gradients: linear-gradient(135deg, #667eea 0%, #764ba2 100%)
-     * Radial gradients: radial-gradient(circle at top right, #f093fb 0%, #f5576c 100%)
-     * Subtle patterns with background-image
-   - Dark mode support with CSS variables
-   - Proper contrast ratios for accessibility
-   - Color psychology: warm colors for energy, cool colors for calm
-
-5. INTERACTIONS & ANIMATIONS - DELIGHTFUL UX:
-   - Smooth transitions (0.3s ease default)
-   - Engaging hover effects: scale, shadow, color shifts
-   - Loading states with spinners or skeleton screens
-   - Micro-interactions that delight users
-   - Button press animations (scale down slightly on click)
-   - Form focus states with glowing borders
-   - Scroll animations for elements entering viewport
-   - Smooth page transitions
-   - Cursor changes to indicate interactivity
-
-6. MODERN CSS FEATURES:
-   - CSS Grid and Flexbox
-   - CSS custom properties (variables)
-   - Modern shadows: box-shadow with subtle depth
-   - Backdrop filters for glassmorphism
-   - Gradient backgrounds
-   - Border radius for softness
-
-7. ACCESSIBILITY:
-   - Semantic HTML5 elements
-   - ARIA labels where needed
-   - Keyboard navigation support
-   - Focus states clearly visible
-   - Alt text for images
-   - Proper heading hierarchy
-
-STYLING FRAMEWORK: {framework}
-{f"- Include proper CDN link in HTML" if "CDN" in framework else "- Implement custom modern CSS with variables"}
-
-TECHNICAL BEST PRACTICES:
-- Clean, semantic HTML5 structure
-- Modular, organized CSS (consider BEM methodology)
-- Modern JavaScript (ES6+)
-- Progressive enhancement
-- Performance optimization
-- Cross-browser compatibility
-
-Remember: The goal is to create websites that make users say "Wow, this looks professional!"
-"""
-    
-    resp = planner_llm.with_structured_output(Plan).invoke(enhanced_prompt)
-    if resp is None:
-        logger.error("Planner did not return a valid response.")
-        raise ValueError("Planner did not return a valid response.")
-    
-    logger.info(f"Plan created with design guidelines: {resp}")
-    logger.info("=== PLANNER AGENT COMPLETED ===")
-    return {"plan": resp}
 
+@build_once
+def get_openai_http_clients() -> tuple:
+    """Shared HTTP/2 connection pools for all OpenAI calls; parallel coder branches
+    multiplex over a few connections instead of opening one per request"""
+    import httpx
 
-def architect_agent(state: dict) -> dict:
-    """Creates detailed TaskPlan from Plan"""
-    logger.info("=== ARCHITECT AGENT STARTED ===")
-    plan: Plan = state["plan"]
-    logger.info(f"Processing plan: {plan.model_dump_json()}")
-    
-    resp = architect_llm.with_structured_output(TaskPlan).invoke(
-        architect_prompt(plan=plan.model_dump_json())
+    limits = httpx.Limits(max_connections=128, max_keepalive_connections=64)
+    return (
+        httpx.Client(http2=True, limits=limits),
+        httpx.AsyncClient(http2=True, limits=limits),
     )
-    if resp is None:
-        logger.error("Architect did not return a valid response.")
-        raise ValueError("Architect did not return a valid response.")
 
-    resp.plan = plan
-    logger.info(f"Task plan created with {len(resp.implementation_steps)} steps")
-    logger.info("=== ARCHITECT AGENT COMPLETED ===")
-    return {"task_plan": resp}
 
+def make_chat_llm(model: str, temperature: float, prompt_cache_key: str):
+    """Creates a ChatOpenAI client on the shared connection pools.
 
-def coder_agent(state: dict) -> dict:
-    """LangGraph tool-using coder agent with modern best practices"""
-    logger.info("=== CODER AGENT STARTED ===")
+    OpenAI caches repeated prompt prefixes automatically; prompt_cache_key routes
+    every call of one agent role to the same cache so its static system prompt hits.
+    """
+    from langchain_openai import ChatOpenAI
 
-    from agent.tools import set_project_root
-    from pathlib import Path
-    
-    # Get project root from state
-    project_root_str = state.get("project_root")
-    if project_root_str:
-        set_project_root(Path(project_root_str))
-        logger.info(f"Set project root from state: {project_root_str}")
-
-    coder_state: CoderState = state.get("coder_state")
-    if coder_state is None:
-        coder_state = CoderState(task_plan=state["task_plan"], current_step_idx=0)
-        logger.info("Initialized new coder state")
-
-    steps = coder_state.task_plan.implementation_steps
-    if coder_state.current_step_idx >= len(steps):
-        logger.info("All implementation steps completed")
-        logger.info("=== CODER AGENT COMPLETED ===")
-        return {"coder_state": coder_state, "status": "DONE"}
-
-    current_task = steps[coder_state.current_step_idx]
-    logger.info(f"Processing step {coder_state.current_step_idx + 1}/{len(steps)}: {current_task.task_description}")
-    logger.info(f"Target file: {current_task.filepath}")
-    
-    existing_content = read_file.run(current_task.filepath)
-    logger.debug(f"Existing content length: {len(existing_content)} characters")
+    http_client, http_async_client = get_openai_http_clients()
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        # extra_body rather than a named argument: openai SDKs before 1.99 don't know prompt_cache_key
+        extra_body={"prompt_cache_key": prompt_cache_key},
+    )
 
-    # Determine file type and add relevant examples
-    file_ext = current_task.filepath.split('.')[-1].lower()
-    
-    examples = ""
-    if file_ext == "html":
-        examples = """
-═══════════════════════════════════════════════════════════════
-MODERN HTML BEST PRACTICES & PATTERNS
-═══════════════════════════════════════════════════════════════
-
-STRUCTURE:
-✓ Use semantic HTML5: <header>, <main>, <section>, <article>, <nav>, <footer>
-✓ Proper document structure with meta tags
-✓ Viewport meta for responsiveness: <meta name="viewport" content="width=device-width, initial-scale=1.0">
-✓ UTF-8 charset: <meta charset="UTF-8">
-
-MODERN HTML PATTERNS:
-<!-- Clean, semantic structure -->
-<header class="site-header">
-  <nav class="nav-container">
-    <a href="#" class="logo">Brand</a>
-    <ul class="nav-menu">
-      <li><a href="#home">Home</a></li>
-    </ul>
-  </nav>
-</header>
-
-<main class="main-content">
-  <section class="hero-section">
-    <div class="container">
-      <h1 class="hero-title">Welcome</h1>
-      <p class="hero-subtitle">Description</p>
-      <button class="btn btn-primary">Get Started</button>
-    </div>
-  </section>
-</main>
-
-ACCESSIBILITY:
-✓ Use semantic elements
-✓ Include alt text for images
-✓ ARIA labels for interactive elements
-✓ Proper heading hierarchy (h1 → h2 → h3)
-
-DATA ATTRIBUTES:
-✓ Use data-* for JavaScript hooks: data-action="submit", data-id="123"
-"""
-    elif file_ext == "css":
-        examples = """
-═══════════════════════════════════════════════════════════════
-MODERN CSS BEST PRACTICES & PATTERNS
-═══════════════════════════════════════════════════════════════
-
-CSS VARIABLES (Custom Properties) - BEAUTIFUL DESIGN SYSTEM:
-:root {
-  /* Colors - Rich & Vibrant Palette */
-  --color-primary: #667eea;
-  --color-secondary: #764ba2;
-  --color-accent: #f093fb;
-  --color-success: #10b981;
-  --color-warning: #f59e0b;
-  --color-error: #ef4444;
-  
-  /* Background - NO PLAIN WHITE! Use gradients or colors */
-  --color-bg-primary: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-  --color-bg-secondary: linear-gradient(to right, #f093fb 0%, #f5576c 100%);
-  --color-bg-light: #f8fafc;
-  --color-bg-card: rgba(255, 255, 255, 0.95);
-  
-  /* Text */
-  --color-text: #1e293b;
-  --color-text-light: #64748b;
-  --color-text-inverse: #ffffff;
-  
-  /* Spacing */
-  --spacing-xs: 0.25rem;
-  --spacing-sm: 0.5rem;
-  --spacing-md: 1rem;
-  --spacing-lg: 2rem;
-  --spacing-xl: 4rem;
-  
-  /* Typography */
-  --font-base: 16px;
-  --font-scale: 1.25;
-  
-  /* Effects - Premium Shadows */
-  --shadow-sm: 0 2px 8px rgba(0,0,0,0.08);
-  --shadow-md: 0 4px 16px rgba(0,0,0,0.12);
-  --shadow-lg: 0 10px 40px rgba(0,0,0,0.16);
-  --shadow-glow: 0 0 20px rgba(102, 126, 234, 0.4);
-  
-  /* Border Radius */
-  --radius-sm: 6px;
-  --radius: 12px;
-  --radius-lg: 20px;
-  
-  /* Transitions */
-  --transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-  --transition-fast: all 0.15s ease;
-}
 
-/* Beautiful Body Background */
-body {
-  background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-  /* OR use a subtle pattern */
-  /* background: #f8fafc url('data:image/svg+xml,...') repeat; */
-  min-height: 100vh;
-}
+# Different LLMs for different tasks
+# Use gpt-4o for strategic planning, gpt-4o-mini for coding (cost optimization)
+@build_once
+def get_planner_llm():
+    """gpt-4o: plans the app and breaks it into tasks in one call"""
+    return make_chat_llm("gpt-4o", temperature=0.8, prompt_cache_key="website-agent-planner")
+
+
+@build_once
+def get_coder_llm():
+    """gpt-4o-mini: fast and efficient for code generation"""
+    return make_chat_llm("gpt-4o-mini", temperature=0.6, prompt_cache_key="website-agent-coder")
+
+
+@build_once
+def get_reviewer_llm():
+    """gpt-4o: critical eye for quality review"""
+    return make_chat_llm("gpt-4o", temperature=0.5, prompt_cache_key="website-agent-reviewer")
+
+
+# Compiled once: the validator parses the planner's reply directly,
+# skipping with_structured_output's parsing chain
+PLANNER_OUTPUT_ADAPTER = TypeAdapter(PlannerArchitectOutput)
+
+
+@build_once
+def get_planner_json_llm():
+    """Planner bound once to a strict json_schema response format"""
+    # The SDK's converter is what OpenAI's own structured outputs use: besides requiring
+    # every property and dropping defaults, it inlines $refs that carry sibling keys
+    # (field descriptions), which strict mode rejects
+    from openai.lib._pydantic import to_strict_json_schema
+
+    return get_planner_llm().bind(
+        response_format={
+            "type": "json_schema",
+            "json_schema": {
+                "name": "PlannerArchitectOutput",
+                "schema": to_strict_json_schema(PlannerArchitectOutput),
+                "strict": True,
+            },
+        }
+    )
 
-MODERN LAYOUT PATTERNS:
-/* Flexbox centering */
-.flex-center {
-  display: flex;
-  justify-content: center;
-  align-items: center;
-}
 
-/* CSS Grid layout */
-.grid-container {
-  display: grid;
-  grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-  gap: var(--spacing-lg);
-}
+@build_once
+def get_embeddings():
+    """Small embedding model for the semantic plan cache"""
+    from langchain_openai import OpenAIEmbeddings
 
-/* Card component - Beautiful & Interactive */
-.card {
-  background: var(--color-bg-card);
-  border-radius: var(--radius);
-  box-shadow: var(--shadow-md);
-  padding: var(--spacing-lg);
-  transition: var(--transition);
-  backdrop-filter: blur(10px);
-  border: 1px solid rgba(255, 255, 255, 0.2);
-}
+    http_client, http_async_client = get_openai_http_clients()
+    return OpenAIEmbeddings(
+        model="text-embedding-3-small",
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
 
-.card:hover {
-  transform: translateY(-8px) scale(1.02);
-  box-shadow: var(--shadow-lg);
-}
 
-MODERN EFFECTS:
-/* Gradient backgrounds */
-.gradient-bg {
-  background: linear-gradient(135deg, var(--color-primary) 0%, var(--color-secondary) 100%);
-}
+# Reuse the plan of an earlier, similarly worded prompt (per worker process);
+# set SEMANTIC_PLAN_CACHE=1 to enable
+SEMANTIC_PLAN_CACHE_ENABLED = os.getenv("SEMANTIC_PLAN_CACHE", "").lower() in ("1", "true", "yes")
+
+
+@build_once
+def get_semantic_plan_cache():
+    """In-memory semantic plan cache; numpy is only imported once the cache is enabled"""
+    from agent.cache import SemanticCache
+
+    return SemanticCache(threshold=float(os.getenv("SEMANTIC_PLAN_CACHE_THRESHOLD", "0.92")))
+
+
+@build_once
+def get_openai_client():
+    """Raw OpenAI SDK client on the shared connection pool, for the Batch API"""
+    from openai import OpenAI
+
+    http_client, _ = get_openai_http_clients()
+    return OpenAI(http_client=http_client)
+
+
+def submit_review_batch(review_prompt: str, custom_id: str) -> str:
+    """Queues the review as a one-request OpenAI batch (half price, separate rate limits) and returns the batch id"""
+    reviewer_llm = get_reviewer_llm()
+    request = {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": reviewer_llm.model_name,
+            "temperature": reviewer_llm.temperature,
+            "messages": [{"role": "user", "content": review_prompt}],
+        },
+    }
+    # Raw UTF-8 with compact separators: no \uXXXX escaping of non-ASCII prompt text
+    # (emoji, box-drawing rules), so the upload is encoded once at its natural size
+    jsonl = json.dumps(request, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    client = get_openai_client()
+    batch_file = client.files.create(
+        file=("review.jsonl", jsonl),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    return batch.id
 
-/* Glassmorphism */
-.glass {
-  background: rgba(255, 255, 255, 0.1);
-  backdrop-filter: blur(10px);
-  border: 1px solid rgba(255, 255, 255, 0.2);
-  border-radius: var(--radius);
-}
 
-/* Button styles - Premium & Interactive */
-.btn {
-  padding: 0.875rem 2rem;
-  border: none;
-  border-radius: var(--radius);
-  font-weight: 600;
-  font-size: 1rem;
-  cursor: pointer;
-  transition: var(--transition);
-  position: relative;
-  overflow: hidden;
-}
+def fetch_review_batch(batch_id: str) -> Tuple[str, Optional[str]]:
+    """Returns (batch status, review text); the text is only set once the batch has completed"""
+    client = get_openai_client()
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != "completed":
+        return batch.status, None
+    if not batch.output_file_id:
+        # The single request failed; details are in the batch's error file
+        return "failed", None
+    result = json.loads(client.files.content(batch.output_file_id).text.splitlines()[0])
+    return batch.status, result["response"]["body"]["choices"][0]["message"]["content"]
 
-.btn-primary {
-  background: linear-gradient(135deg, var(--color-primary), var(--color-secondary));
-  color: white;
-  box-shadow: var(--shadow-md);
-}
 
-.btn-primary:hover {
-  transform: translateY(-2px);
-  box-shadow: var(--shadow-lg), var(--shadow-glow);
-}
+# Shared pool for blocking file reads fanned out from graph nodes
+file_io_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="agent-file-io")
 
-.btn-primary:active {
-  transform: translateY(0);
-}
+coder_tools = [read_file, write_file, list_files, get_current_directory]
 
-/* Button ripple effect */
-.btn::after {
-  content: '';
-  position: absolute;
-  top: 50%;
-  left: 50%;
-  width: 0;
-  height: 0;
-  border-radius: 50%;
-  background: rgba(255, 255, 255, 0.3);
-  transform: translate(-50%, -50%);
-  transition: width 0.6s, height 0.6s;
-}
 
-.btn:active::after {
-  width: 300px;
-  height: 300px;
-}
+@build_once
+def get_coder_react_agent():
+    """The coder's React agent, built once and reused for every implementation step"""
+    from langgraph.prebuilt import create_react_agent
 
-RESPONSIVE DESIGN:
-/* Mobile first approach */
-.container {
-  width: 100%;
-  padding: 0 var(--spacing-md);
-  margin: 0 auto;
-}
+    # The step prompt already carries the target path and its current content,
+    # so the first turn goes straight to write_file instead of exploring first
+    first_turn_llm = get_coder_llm().bind_tools(coder_tools, tool_choice="write_file")
+    follow_up_llm = get_coder_llm().bind_tools(coder_tools)
 
-/* Tablet */
-@media (min-width: 640px) {
-  .container { max-width: 640px; }
-}
+    def select_coder_model(state, runtime):
+        # Only force the tool until the first call; forcing it every turn would never let the agent finish
+        if any(getattr(message, "tool_calls", None) for message in state["messages"]):
+            return follow_up_llm
+        return first_turn_llm
 
-/* Desktop */
-@media (min-width: 1024px) {
-  .container { max-width: 1024px; }
-  /* Add desktop-specific styles */
-}
+    return create_react_agent(select_coder_model, coder_tools)
 
-ANIMATIONS:
-@keyframes fadeIn {
-  from { opacity: 0; transform: translateY(20px); }
-  to { opacity: 1; transform: translateY(0); }
-}
 
-.animate-fade-in {
-  animation: fadeIn 0.6s ease-out;
-}
-"""
-    elif file_ext == "js":
-        examples = """
-═══════════════════════════════════════════════════════════════
-MODERN JAVASCRIPT BEST PRACTICES & PATTERNS
-═══════════════════════════════════════════════════════════════
-
-ES6+ FEATURES:
-✓ Use const/let instead of var
-✓ Arrow functions for cleaner syntax
-✓ Destructuring for cleaner code
-✓ Template literals for string interpolation
-✓ Spread operator for arrays/objects
-
-MODERN PATTERNS:
-
-// DOM Selection (cache selectors)
-const elements = {
-  form: document.querySelector('#myForm'),
-  input: document.querySelector('#myInput'),
-  button: document.querySelector('#myButton'),
-  display: document.querySelector('#display')
-};
-
-// Event Delegation (efficient for dynamic content)
-document.addEventListener('click', (e) => {
-  if (e.target.matches('.btn-delete')) {
-    handleDelete(e.target.dataset.id);
-  }
-});
-
-// Modern fetch with async/await
-const fetchData = async (url) => {
-  try {
-    const response = await fetch(url);
-    if (!response.ok) throw new Error('Network error');
-    const data = await response.json();
-    return data;
-  } catch (error) {
-    console.error('Fetch error:', error);
-    showError('Failed to load data');
-  }
-};
-
-// Debouncing for performance
-const debounce = (func, delay = 300) => {
-  let timeoutId;
-  return (...args) => {
-    clearTimeout(timeoutId);
-    timeoutId = setTimeout(() => func(...args), delay);
-  };
-};
-
-// Usage
-const handleSearch = debounce((query) => {
-  console.log('Searching for:', query);
-}, 300);
-
-// Class-based component (optional)
-class Calculator {
-  constructor() {
-    this.currentValue = 0;
-    this.previousValue = 0;
-    this.operation = null;
-    this.init();
-  }
-  
-  init() {
-    this.bindEvents();
-    this.updateDisplay();
-  }
-  
-  bindEvents() {
-    document.querySelectorAll('.btn-number').forEach(btn => {
-      btn.addEventListener('click', () => this.handleNumber(btn.dataset.number));
-    });
-  }
-  
-  updateDisplay() {
-    document.querySelector('#display').textContent = this.currentValue;
-  }
+# Styling frameworks the user can ask for by name, in priority order when several are mentioned
+FRAMEWORK_PATTERN = re.compile(r"(tailwind|bootstrap)", re.IGNORECASE)
+FRAMEWORKS_BY_KEYWORD = {
+    "tailwind": "TailwindCSS via CDN",
+    "bootstrap": "Bootstrap 5 via CDN",
 }
 
-// Initialize when DOM is ready
-document.addEventListener('DOMContentLoaded', () => {
-  // Your initialization code here
-  console.log('App initialized');
-});
-
-ERROR HANDLING:
-✓ Always use try-catch for async operations
-✓ Provide user feedback for errors
-✓ Log errors for debugging
-
-USER FEEDBACK:
-✓ Show loading states
-✓ Display success/error messages
-✓ Disable buttons during processing
-✓ Validate input before processing
-
-PERFORMANCE:
-✓ Cache DOM queries
-✓ Use event delegation
-✓ Debounce/throttle expensive operations
-✓ Avoid unnecessary re-renders
-"""
+
+# Agent Functions
+def plan_and_design_agent(state: AgentState) -> dict:
+    """Converts user prompt into a structured Plan with design excellence and its TaskPlan in one LLM call"""
+    logger.info("=== PLAN & DESIGN AGENT STARTED ===")
+    user_prompt = state["user_prompt"]
+    logger.info("User prompt: %s", user_prompt)
+    
+    # Detect styling framework preference in a single scan of the prompt
+    mentioned = {keyword.lower() for keyword in FRAMEWORK_PATTERN.findall(user_prompt)}
+    framework = next(
+        (name for keyword, name in FRAMEWORKS_BY_KEYWORD.items() if keyword in mentioned),
+        "custom modern css"
+    )
+    
+    # Only the framework choice varies; the design guidelines are part of the system prompt
+    styling_framework = STYLING_FRAMEWORK_TEMPLATE.substitute(
+        framework=framework,
+        framework_instruction=(
+            "- Include proper CDN link in HTML" if "CDN" in framework
+            else "- Implement custom modern CSS with variables"
+        ),
+    )
+    
+    # Plans are only reused for prompts asking for the same styling framework
+    cached_plan = None
+    prompt_embedding = None
+    if SEMANTIC_PLAN_CACHE_ENABLED:
+        # The cache is only an optimization: if embedding fails, plan without it
+        try:
+            prompt_embedding = get_embeddings().embed_query(user_prompt)
+        except Exception as e:
+            logger.warning("Could not embed prompt for the semantic plan cache: %s", e)
+        if prompt_embedding is not None:
+            cached_plan = get_semantic_plan_cache().lookup(prompt_embedding, namespace=framework)
+    
+    if cached_plan is not None:
+        logger.info("Semantic plan cache hit, skipping the planning LLM call")
+        resp = PLANNER_OUTPUT_ADAPTER.validate_json(cached_plan)
+    else:
+        # Static instructions first as the system message so their prefix is cached across builds
+        response = get_planner_json_llm().invoke([
+            {"role": "system", "content": plan_and_design_prompt()},
+            {"role": "user", "content": plan_and_design_request(user_prompt, styling_framework)},
+        ])
+        if not response.content:
+            logger.error("Planner did not return a valid response.")
+            raise ValueError("Planner did not return a valid response.")
+        resp = PLANNER_OUTPUT_ADAPTER.validate_json(response.content)
+        if prompt_embedding is not None:
+            get_semantic_plan_cache().add(prompt_embedding, response.content, namespace=framework)
+    
+    task_plan = resp.task_plan
+    task_plan.plan = resp.plan
+    logger.info("Plan created with design guidelines: %s", resp.plan)
+    logger.info("Task plan created with %d steps", len(task_plan.implementation_steps))
+    logger.info("=== PLAN & DESIGN AGENT COMPLETED ===")
+    return {"plan": resp.plan, "task_plan": task_plan}
+
+
+def implement_step(current_task: ImplementationTask, step_number: int, total_steps: int) -> None:
+    """Runs the React agent for a single implementation step"""
+    logger.info("Processing step %d/%d: %s", step_number, total_steps, current_task.task_description)
+    logger.info("Target file: %s", current_task.filepath)
+    
+    existing_content = read_file.run(current_task.filepath)
+    logger.debug("Existing content length: %d characters", len(existing_content))
+    # Determine file type and add relevant examples
+    file_ext = os.path.splitext(current_task.filepath)[1][1:].lower()
+    examples = CODER_EXAMPLES_BY_EXT.get(file_ext, "")
 
     system_prompt = coder_system_prompt()
+    # Per-extension examples lead the message so they extend the cached prompt prefix;
+    # everything specific to this step follows
     user_prompt = (
+        f"{examples}\n\n"
         f"═══════════════════════════════════════════════════════════════\n"
-        f"IMPLEMENTATION TASK #{coder_state.current_step_idx + 1}\n"
+        f"IMPLEMENTATION TASK #{step_number}\n"
         f"═══════════════════════════════════════════════════════════════\n\n"
         f"TASK DESCRIPTION:\n{current_task.task_description}\n\n"
         f"TARGET FILE: {current_task.filepath}\n\n"
-        f"{examples}\n\n"
         f"EXISTING CONTENT:\n{existing_content if existing_content else '(Empty file - create from scratch)'}\n\n"
         f"═══════════════════════════════════════════════════════════════\n"
         f"CRITICAL REQUIREMENTS:\n"
         f"═══════════════════════════════════════════════════════════════\n"
         f"1. You MUST use write_file('{current_task.filepath}', content) to save your code\n"
         f"2. Write PRODUCTION-READY, MODERN, BEAUTIFUL code\n"
-        f"3. Follow ALL best practices shown in the examples above\n"
+        f"3. Follow ALL best practices shown in the examples at the top\n"
         f"4. Make it visually stunning and professional\n"
         f"5. Ensure full functionality - no placeholders or TODOs\n"
         f"6. Use modern patterns, clean syntax, and proper structure\n\n"
         f"CREATE AMAZING CODE NOW! 🚀\n"
     )
 
-    coder_tools = [read_file, write_file, list_files, get_current_directory]
-    react_agent = create_react_agent(coder_llm, coder_tools)
-
     logger.info("Invoking React agent for code generation...")
     
     # Ensure project root is set before invoking React agent
-    from agent.tools import get_project_root
     current_root = get_project_root()
     if current_root:
-        logger.info(f"Project root confirmed: {current_root}")
+        logger.info("Project root confirmed: %s", current_root)
     else:
         logger.warning("⚠ WARNING: Project root not set in coder_agent thread!")
     
-    result = react_agent.invoke({
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-    })
+    # Stream node updates so each tool call is logged as soon as the model emits it
+    # and each write is confirmed as it lands, rather than after the whole run
+    tool_calls_made = 0
+    last_message = None
+    for update in get_coder_react_agent().stream(
+        {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+        },
+        stream_mode="updates"
+    ):
+        for node_update in update.values():
+            for message in (node_update or {}).get("messages", []):
+                last_message = message
+                for tool_call in getattr(message, "tool_calls", None) or []:
+                    tool_calls_made += 1
+                    logger.info("  - Tool: %s", tool_call.get('name', 'unknown'))
     
     # Log the agent's response to see what happened
-    if result and "messages" in result:
-        last_message = result["messages"][-1]
-        logger.info(f"Agent response: {last_message.content[:200]}...")
-        
-        # Check if write_file was actually called
-        tool_calls = [msg for msg in result["messages"] if hasattr(msg, 'tool_calls') and msg.tool_calls]
-        if tool_calls:
-            logger.info(f"✓ Tools called: {len(tool_calls)} tool calls made")
-            for msg in tool_calls:
-                for tool_call in msg.tool_calls:
-                    logger.info(f"  - Tool: {tool_call.get('name', 'unknown')}")
-        else:
-            logger.warning("⚠ WARNING: No tool calls detected - file may not have been written!")
+    if last_message is not None:
+        logger.info("Agent response: %s...", last_message.content[:200])
     
-    logger.info(f"Step {coder_state.current_step_idx + 1} completed")
+    # Check if write_file was actually called
+    if tool_calls_made:
+        logger.info("✓ Tools called: %d tool calls made", tool_calls_made)
+    else:
+        logger.warning("⚠ WARNING: No tool calls detected - file may not have been written!")
+    
+    logger.info("Step %d completed", step_number)
+
+
+def coder_agent(state: CoderStep) -> dict:
+    """LangGraph tool-using coder agent for one target file; branches for other files run in parallel"""
+    logger.info("=== CODER AGENT STARTED ===")
+    
+    # The project root comes from the ContextVar set in run_agent, which LangGraph copies
+    # into every branch; never from the Send, which a plan cache hit replays from another build
+    logger.info("Project root: %s", get_project_root())
+
+    # Steps for the same file run in order within this branch
+    for step_number, current_task in state["steps"]:
+        implement_step(current_task, step_number, state["total_steps"])
+
+    logger.info("=== CODER AGENT COMPLETED: %s ===", state["filepath"])
+    return {"completed_files": [state["filepath"]]}
+
+
+def dispatch_coder_steps(state: AgentState):
+    """Fans out one coder branch per target file so independent files are generated concurrently"""
+    steps = state["task_plan"].implementation_steps
+    if not steps:
+        logger.info("No implementation steps, skipping coder")
+        return "reviewer"
+
+    steps_by_file = {}
+    for idx, step in enumerate(steps):
+        filepath = os.path.normpath(step.filepath.lstrip('/'))
+        steps_by_file.setdefault(filepath, []).append((idx + 1, step))
+
+    logger.info("Dispatching %d steps across %d coder branches", len(steps), len(steps_by_file))
+    return [
+        Send("coder", {
+            "filepath": filepath,
+            "steps": file_steps,
+            "total_steps": len(steps),
+        })
+        for filepath, file_steps in steps_by_file.items()
+    ]
 
-    coder_state.current_step_idx += 1
-    return {"coder_state": coder_state}
 
+# Patterns for the reviewer's per-file structure summary
+HTML_TAG_PATTERN = re.compile(r"<([a-zA-Z][\w-]*)")
+CSS_CLASS_SELECTOR_PATTERN = re.compile(r"\.([a-zA-Z_][\w-]*)(?=[^{}]*\{)")
+CSS_CUSTOM_PROPERTY_PATTERN = re.compile(r"(--[\w-]+)\s*:")
+JS_FUNCTION_PATTERN = re.compile(
+    r"function\s+(\w+)|(?:const|let|var)\s+(\w+)\s*=\s*(?:async\s*)?(?:\([^)]*\)|\w+)\s*=>"
+)
 
-def reviewer_agent(state: dict) -> dict:
+REVIEW_HEAD_CHARS = 200
+
+
+def summarize_file(content: str, file_ext: str) -> dict:
+    """Builds a compact structural summary of a generated file for the reviewer"""
+    if file_ext == ".html":
+        tags = Counter(tag.lower() for tag in HTML_TAG_PATTERN.findall(content))
+        return {"tags": dict(tags.most_common(25))}
+    if file_ext == ".css":
+        return {
+            "class_selectors": sorted(set(CSS_CLASS_SELECTOR_PATTERN.findall(content)))[:50],
+            "custom_properties": len(set(CSS_CUSTOM_PROPERTY_PATTERN.findall(content))),
+            "media_queries": content.count("@media"),
+            "keyframes": content.count("@keyframes"),
+        }
+    if file_ext == ".js":
+        functions = [named or arrow for named, arrow in JS_FUNCTION_PATTERN.findall(content)]
+        return {
+            "functions": functions[:50],
+            "event_listeners": content.count("addEventListener"),
+            "try_blocks": content.count("try {") + content.count("try{"),
+        }
+    return {}
+
+
+def review_entry(path: str, content: str) -> dict:
+    """Reviewer payload for one file: hash, size, structure summary and opening lines"""
+    return {
+        "file": path,
+        "sha": hashlib.sha256(content.encode("utf-8")).hexdigest()[:8],
+        "size": len(content),
+        "lines": content.count("\n") + 1,
+        "summary": summarize_file(content, os.path.splitext(path)[1].lower()),
+        "head": content[:REVIEW_HEAD_CHARS],
+    }
+
+
+def reviewer_agent(state: AgentState) -> dict:
     """Reviews generated code for quality and beauty"""
     logger.info("=== REVIEWER AGENT STARTED ===")
     
-    from agent.tools import set_project_root
-    from pathlib import Path
-    
     # Set project root from state
     project_root_str = state.get("project_root")
     if project_root_str:
         set_project_root(Path(project_root_str))
-        logger.info(f"Set project root for reviewer: {project_root_str}")
+        logger.info("Set project root for reviewer: %s", project_root_str)
     
-    coder_state = state.get("coder_state")
-    if not coder_state:
-        logger.info("No coder state found, skipping review")
+    completed_files = state.get("completed_files")
+    if not completed_files:
+        logger.info("No coder output found, skipping review")
         return {"review": "Skipped - no code to review"}
     
-    task_plan = coder_state.task_plan
+    project_root = get_project_root()
+    project_root_resolved = get_project_root_resolved()
     
-    # Read all generated files
+    def read_for_review(filepath: str) -> str:
+        # file_io_executor is a plain ThreadPoolExecutor: it doesn't copy the caller's
+        # context, so the project root ContextVar is unset in its threads
+        if project_root is not None:
+            set_project_root(project_root, project_root_resolved)
+        return read_file.run(filepath)
+    
+    # Read all generated files concurrently
+    pending_reads = {
+        filepath: file_io_executor.submit(read_for_review, filepath)
+        for filepath in sorted(completed_files)
+    }
     generated_files = {}
-    for step in task_plan.implementation_steps:
+    for filepath, pending_read in pending_reads.items():
         try:
-            content = read_file.run(step.filepath)
+            content = pending_read.result()
             if content:
-                generated_files[step.filepath] = content
-                logger.info(f"✓ Read file for review: {step.filepath} ({len(content)} chars)")
+                generated_files[filepath] = content
+                logger.info("✓ Read file for review: %s (%d chars)", filepath, len(content))
         except Exception as e:
-            logger.warning(f"Could not read {step.filepath}: {e}")
+            logger.warning("Could not read %s: %s", filepath, e)
     
     if not generated_files:
         logger.info("No files generated to review")
         return {"review": "No files generated"}
     
+    # Review criteria first and the generated files last, so the prompt prefix is the same for every build
     review_prompt = f"""
 You are a senior code reviewer specializing in web development and UI/UX design.
 
-Review the following generated website files:
-
-{json.dumps({k: v[:500] + "..." if len(v) > 500 else v for k, v in generated_files.items()}, indent=2)}
+Review the generated website files listed at the end of this message.
 
 REVIEW CRITERIA:
 
@@ -678,9 +544,22 @@ Provide:
 - Specific actionable suggestions
 
 Keep it concise but actionable.
+
+GENERATED FILES (each entry has the file's size, a structural summary of its
+HTML tags, CSS selectors and JS functions, and its opening lines):
+
+{json.dumps([review_entry(path, content) for path, content in generated_files.items()], indent=2)}
 """
     
-    review_response = reviewer_llm.invoke(review_prompt)
+    if state.get("batch_mode"):
+        # Nothing downstream waits for the review, so defer it instead of blocking the build
+        custom_id = os.path.basename(project_root_str or "") or "review"
+        batch_id = submit_review_batch(review_prompt, custom_id)
+        logger.info("Review submitted to the OpenAI Batch API: %s", batch_id)
+        logger.info("=== REVIEWER AGENT COMPLETED ===")
+        return {"review": f"Deferred to batch {batch_id}", "review_batch_id": batch_id}
+    
+    review_response = get_reviewer_llm().invoke(review_prompt)
     review_content = review_response.content
     
     logger.info("=== CODE REVIEW RESULTS ===")
@@ -690,27 +569,54 @@ Keep it concise but actionable.
     return {"review": review_content}
 
 
+def plan_cache_key(state: AgentState) -> str:
+    """Cache key for plan_and_design: the plan only depends on the user prompt"""
+    return hashlib.sha256(state["user_prompt"].encode("utf-8")).hexdigest()
+
+
+# Node-level cache for repeated prompts; set AGENT_CACHE_PATH="" to disable
+AGENT_CACHE_PATH = os.getenv("AGENT_CACHE_PATH", ".langgraph_cache.db")
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", "86400"))
+
+
+def make_node_cache():
+    """SQLite node cache at AGENT_CACHE_PATH (from langgraph-checkpoint-sqlite), or None when disabled"""
+    if not AGENT_CACHE_PATH:
+        return None
+    from langgraph.cache.sqlite import SqliteCache
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    # Cached plan_and_design writes hold these models; allow-list them for deserialization
+    serde = JsonPlusSerializer(allowed_msgpack_modules=[Plan, TaskPlan, ImplementationTask, File])
+    return SqliteCache(path=AGENT_CACHE_PATH, serde=serde)
+
+
 # Build the LangGraph
-graph = StateGraph(dict)
+graph = StateGraph(AgentState)
 
-graph.add_node("planner", planner_agent)
-graph.add_node("architect", architect_agent)
+graph.add_node(
+    "plan_and_design",
+    plan_and_design_agent,
+    cache_policy=CachePolicy(key_func=plan_cache_key, ttl=PLAN_CACHE_TTL_SECONDS)
+)
 graph.add_node("coder", coder_agent)
 graph.add_node("reviewer", reviewer_agent)
 
-graph.add_edge("planner", "architect")
-graph.add_edge("architect", "coder")
-graph.add_conditional_edges(
-    "coder",
-    lambda s: "reviewer" if s.get("status") == "DONE" else "coder",
-    {"reviewer": "reviewer", "coder": "coder"}
-)
+graph.add_conditional_edges("plan_and_design", dispatch_coder_steps, ["coder", "reviewer"])
+graph.add_edge("coder", "reviewer")
 graph.add_edge("reviewer", END)
 
-graph.set_entry_point("planner")
+graph.set_entry_point("plan_and_design")
 
 # Compile the agent
-agent = graph.compile()
+# Builds are single-shot runs, so no checkpointer: it would serialize the whole
+# state (plan, task_plan, file list) after every superstep. The node cache is
+# cheap and stays on. If thread persistence is ever needed, pass an async
+# saver (e.g. AsyncSqliteSaver) here rather than the in-memory pickling saver.
+agent = graph.compile(
+    checkpointer=None,
+    cache=make_node_cache(),
+)
 
 logger.info("Enhanced LangGraph agent compiled and ready")
 logger.info("Features: Design-focused planning, modern best practices, code review")
\ No newline at end of file
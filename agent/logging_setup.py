@@ -0,0 +1,52 @@
+# =============================================================================
+# LOGGING SETUP MODULE
+# =============================================================================
+# This module configures logging for the agent, the API server and workers.
+# Maps to: A single place that wires the console handler and the
+# agent_execution.log file handler used by every entry point.
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
+
+LOG_FILE = "agent_execution.log"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Set LOG_LEVEL=WARNING in production to skip the per-step INFO logs
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Records buffered before the log file is written; ERROR and above flush immediately
+LOG_BUFFER_CAPACITY = 1024
+
+
+def configure_logging() -> None:
+    """Routes root logging through a queue; a background listener writes to the console and a buffered log file."""
+    root = logging.getLogger()
+    if root.handlers:
+        return  # Already configured by another entry point
+
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    file_handler = logging.FileHandler(LOG_FILE)
+    file_handler.setFormatter(formatter)
+
+    # Batch file writes instead of a write+flush per record
+    buffered_file_handler = MemoryHandler(
+        capacity=LOG_BUFFER_CAPACITY,
+        flushLevel=logging.ERROR,
+        target=file_handler,
+    )
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+
+    # Logging calls only enqueue the record; the listener thread does the I/O
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, buffered_file_handler, console_handler)
+    listener.start()
+    atexit.register(listener.stop)  # Drain the queue before logging's own shutdown flush
+
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
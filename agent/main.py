@@ -1,16 +1,7 @@
+import os
 import uvicorn
 import logging
-from agent.api import app
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('agent_execution.log'),
-        logging.StreamHandler()
-    ]
-)
+from agent.api import app  # Configures logging on import, here and in every worker/reload process
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +13,21 @@ if __name__ == "__main__":
     logger.info("API documentation at: http://localhost:8000/docs")
     logger.info("="*60)
     
-    uvicorn.run(
-        "agent.api:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
-    )
\ No newline at end of file
+    if os.getenv("ENV") == "dev":
+        # Auto-reload on code changes; single process with a file watcher
+        uvicorn.run(
+            "agent.api:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True
+        )
+    else:
+        # Production: one process per core on uvloop + httptools, no file watcher
+        uvicorn.run(
+            "agent.api:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=int(os.getenv("WORKERS", os.cpu_count() or 1)),
+            loop="uvloop",
+            http="httptools"
+        )
@@ -1,11 +1,12 @@
-from typing import Optional
+import operator
+from typing import Annotated, Optional, TypedDict
 
 from pydantic import BaseModel, Field, ConfigDict
 
 
 class File(BaseModel):
     """File to be created or modified"""
-    model_config = ConfigDict(extra='forbid')
+    model_config = ConfigDict(extra='forbid', frozen=True)  # Never modified after parsing; hashable
     
     path: str = Field(description="The path to the file to be created or modified")
     purpose: str = Field(description="The purpose of the file, e.g. 'main application logic', 'data processing module', etc.")
@@ -24,7 +25,7 @@ class Plan(BaseModel):
 
 class ImplementationTask(BaseModel):
     """Individual implementation task"""
-    model_config = ConfigDict(extra='forbid')
+    model_config = ConfigDict(extra='forbid', frozen=True)  # Never modified after parsing; hashable
     
     filepath: str = Field(description="The path to the file to be modified")
     task_description: str = Field(description="A detailed description of the task to be performed on the file, e.g. 'add user authentication', 'implement data processing logic', etc.")
@@ -38,11 +39,32 @@ class TaskPlan(BaseModel):
     implementation_steps: list[ImplementationTask] = Field(description="A list of steps to be taken to implement the task")
     
 
-class CoderState(BaseModel):
-    """State for the coder agent"""
+class PlannerArchitectOutput(BaseModel):
+    """Plan and TaskPlan produced together by the combined planning call"""
     model_config = ConfigDict(extra='forbid')
     
-    task_plan: TaskPlan = Field(description="The plan for the task to be implemented")
-    current_step_idx: int = Field(default=0, description="The index of the current step in the implementation steps")
-    current_file_content: Optional[str] = Field(default=None, description="The content of the file currently being edited or created")
-    project_root: Optional[str] = Field(default=None, description="The root directory for the project")
\ No newline at end of file
+    plan: Plan = Field(description="The plan for the application to be built")
+    task_plan: TaskPlan = Field(description="The ordered implementation tasks for that plan")
+
+
+class CoderStep(TypedDict):
+    """Input for one parallel coder branch: every step that targets a single file.
+
+    No run-specific data here: the Sends are part of plan_and_design's cached writes
+    and are replayed as-is for later builds with the same prompt.
+    """
+    filepath: str
+    steps: list[tuple[int, ImplementationTask]]  # (1-based step number, task)
+    total_steps: int
+
+
+class AgentState(TypedDict, total=False):
+    """State shared by the LangGraph nodes"""
+    user_prompt: str
+    project_root: Optional[str]
+    plan: Plan
+    task_plan: TaskPlan
+    completed_files: Annotated[list[str], operator.add]  # Merged from parallel coder branches
+    review: str
+    batch_mode: bool  # Defer the review to the OpenAI Batch API instead of waiting for it
+    review_batch_id: str
@@ -0,0 +1,203 @@
+# =============================================================================
+# TASK STORAGE MODULE
+# =============================================================================
+# This module persists build task records in Redis.
+# Maps to: Shared task state for the API server, so task status survives
+# restarts and is visible to every uvicorn worker process.
+#
+# Layout:
+#   task:{task_id}         -> hash with the task record
+#   task:{task_id}:files   -> list of generated file paths, written once on completion
+#   tasks:running          -> set of task ids that are pending or processing
+#   tasks:finished         -> set of task ids that completed or failed
+
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Finished tasks expire after this many seconds to cap Redis memory
+TASK_TTL_SECONDS = int(os.getenv("TASK_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+
+RUNNING_TASKS_KEY = "tasks:running"
+FINISHED_TASKS_KEY = "tasks:finished"
+
+redis_client = Redis.from_url(REDIS_URL, decode_responses=True)
+
+
+@dataclass(slots=True)
+class TaskRecord:
+    """A build task as stored in its Redis hash"""
+    task_id: str
+    status: str  # "pending", "processing", "completed", "failed"
+    progress: str  # "initialized", "planner", "architect", "done"
+    user_prompt: str
+    created_at: str
+    project_path: Optional[str] = None
+    resolved_project_path: Optional[str] = None
+    error: Optional[str] = None
+    completed_at: Optional[str] = None
+    review: Optional[str] = None
+    review_batch_id: Optional[str] = None  # Set when the review was deferred to the OpenAI Batch API
+    review_status: Optional[str] = None  # "pending" until that batch finishes, then its final status
+
+    @classmethod
+    def from_hash(cls, raw: Dict[str, str]) -> "TaskRecord":
+        """Builds a record from a Redis hash, ignoring unknown fields."""
+        return cls(**{name: raw[name] for name in _TASK_RECORD_FIELDS if name in raw})
+
+
+_TASK_RECORD_FIELDS = tuple(f.name for f in fields(TaskRecord))
+
+
+# (unix second, ISO string) for that second; replaced as one tuple so readers never see a mix
+_iso_cache = (0, "")
+
+
+def now_iso() -> str:
+    """Returns the current local time in ISO format, formatting at most once per second."""
+    global _iso_cache
+    second = int(time.time())
+    cached_second, cached_iso = _iso_cache
+    if cached_second != second:
+        cached_iso = datetime.fromtimestamp(second).isoformat()
+        _iso_cache = (second, cached_iso)
+    return cached_iso
+
+
+def task_key(task_id: str) -> str:
+    """Returns the Redis hash key holding a task record."""
+    return f"task:{task_id}"
+
+
+def files_key(task_id: str) -> str:
+    """Returns the Redis list key holding a task's generated file paths."""
+    return f"task:{task_id}:files"
+
+
+def _serialize(fields: Dict) -> Dict[str, str]:
+    """Converts task fields into Redis hash values. None values are dropped."""
+    return {key: value for key, value in fields.items() if value is not None}
+
+
+async def create_task(record: TaskRecord) -> None:
+    """Stores a new task record and marks it as running."""
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(task_key(record.task_id), mapping=_serialize(asdict(record)))
+        pipe.sadd(RUNNING_TASKS_KEY, record.task_id)
+        await pipe.execute()
+
+
+# Writes from the worker only touch a task whose record still exists: a blind HSET after
+# DELETE /api/task/{id} would recreate a partial record (unreadable, and without a TTL)
+# KEYS: task hash; ARGV: field, value, ...
+_UPDATE_EXISTING_TASK = redis_client.register_script("""
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return 0
+end
+redis.call("HSET", KEYS[1], unpack(ARGV))
+return 1
+""")
+
+# KEYS: task hash, files list, running set, finished set
+# ARGV: TTL, task id, number of field/value items, field, value, ..., file paths
+_FINISH_EXISTING_TASK = redis_client.register_script("""
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return 0
+end
+local item_count = tonumber(ARGV[3])
+if item_count > 0 then
+    redis.call("HSET", KEYS[1], unpack(ARGV, 4, 3 + item_count))
+end
+if #ARGV > 3 + item_count then
+    redis.call("RPUSH", KEYS[2], unpack(ARGV, 4 + item_count))
+    redis.call("EXPIRE", KEYS[2], ARGV[1])
+end
+redis.call("SMOVE", KEYS[3], KEYS[4], ARGV[2])
+redis.call("EXPIRE", KEYS[1], ARGV[1])
+return 1
+""")
+
+
+def _flatten(mapping: Dict[str, str]) -> List[str]:
+    """Turns a hash mapping into the field, value, ... argument list HSET takes."""
+    return [item for pair in mapping.items() for item in pair]
+
+
+async def update_task(task_id: str, **fields) -> bool:
+    """Updates fields of an existing task record in a single HSET.
+
+    Returns False, writing nothing, if the task no longer exists (e.g. it was deleted).
+    """
+    mapping = _serialize(fields)
+    if not mapping:
+        return await redis_client.exists(task_key(task_id)) == 1
+    return await _UPDATE_EXISTING_TASK(keys=[task_key(task_id)], args=_flatten(mapping)) == 1
+
+
+async def finish_task(task_id: str, files: Optional[List[str]] = None, **fields) -> bool:
+    """Stores the final task fields and file list, moves the task to the finished set and starts its TTL.
+
+    Returns False, writing nothing, if the task no longer exists (e.g. it was deleted).
+    """
+    items = _flatten(_serialize(fields))
+    finished = await _FINISH_EXISTING_TASK(
+        keys=[task_key(task_id), files_key(task_id), RUNNING_TASKS_KEY, FINISHED_TASKS_KEY],
+        args=[TASK_TTL_SECONDS, task_id, len(items), *items, *(files or [])],
+    )
+    return finished == 1
+
+
+async def get_task(task_id: str) -> Optional[TaskRecord]:
+    """Returns the task record, or None if the task does not exist."""
+    raw = await redis_client.hgetall(task_key(task_id))
+    return TaskRecord.from_hash(raw) if raw else None
+
+
+async def get_files(task_id: str) -> List[str]:
+    """Returns the cached file list of a finished task."""
+    return await redis_client.lrange(files_key(task_id), 0, -1)
+
+
+async def delete_task(task_id: str) -> None:
+    """Removes a task record and its set memberships."""
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(task_key(task_id), files_key(task_id))
+        pipe.srem(RUNNING_TASKS_KEY, task_id)
+        pipe.srem(FINISHED_TASKS_KEY, task_id)
+        await pipe.execute()
+
+
+async def list_task_summaries() -> List[Tuple[str, str, str]]:
+    """Returns (task_id, status, created_at) for every known task, pruning ids whose records have expired."""
+    task_ids = list(await redis_client.sunion(RUNNING_TASKS_KEY, FINISHED_TASKS_KEY))
+    if not task_ids:
+        return []
+
+    # HMGET only the listed fields instead of loading whole records
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for task_id in task_ids:
+            pipe.hmget(task_key(task_id), "status", "created_at")
+        rows = await pipe.execute()
+
+    summaries = []
+    expired = []
+    for task_id, (status, created_at) in zip(task_ids, rows):
+        if status is not None:
+            summaries.append((task_id, status, created_at))
+        else:
+            expired.append(task_id)
+
+    if expired:
+        logger.info("Pruning %d expired task ids", len(expired))
+        await redis_client.srem(FINISHED_TASKS_KEY, *expired)
+
+    return summaries
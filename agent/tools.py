@@ -5,118 +5,214 @@
 # Maps to: Core utilities used by the coder agent to interact with the filesystem
 # while maintaining security boundaries within the project root directory.
 
+import asyncio
+import functools
+import os
 import pathlib
+import re
+import shlex
 import subprocess
 import threading
 import logging
-from typing import Tuple
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Tuple
 
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
 
 logger = logging.getLogger(__name__)
 
-# Thread-local storage for PROJECT_ROOT to support concurrent tasks
-_thread_local = threading.local()
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, the counter file is updated unlocked
+    fcntl = None
 
-# Global fallback for when thread-local doesn't work (e.g., in React agent context)
-_global_project_root = None
-_global_lock = threading.Lock()
+# Next free generated_project_N serial ID, kept on disk so new projects don't rescan cwd
+SERIAL_COUNTER_FILE = ".next_serial"
+PROJECT_DIR_PATTERN = re.compile(r"generated_project_(\d+)$")
+
+# (project root, resolved project root) for the current context. This is the only
+# store: reads are one lock-free ContextVar lookup, and the value is copied into
+# threads started through context-aware executors (asyncio.to_thread, LangChain/
+# LangGraph executors), so concurrent builds and tool calls each see their own root
+_project_root_var: ContextVar[Optional[Tuple[pathlib.Path, pathlib.Path]]] = ContextVar(
+    "project_root", default=None
+)
 
 
 def get_project_root():
-    """Get the project root for the current thread, with global fallback."""
-    # Try thread-local first
-    thread_root = getattr(_thread_local, 'PROJECT_ROOT', None)
-    if thread_root is not None:
-        return thread_root
-    
-    # Fallback to global
-    with _global_lock:
-        return _global_project_root
+    """Get the project root for the current context."""
+    roots = _project_root_var.get()
+    return roots[0] if roots is not None else None
 
 
-def set_project_root(path: pathlib.Path):
-    """Set the project root for the current thread and globally."""
-    global _global_project_root
-    
-    # Set thread-local
-    _thread_local.PROJECT_ROOT = path
-    
-    # Also set global as fallback
-    with _global_lock:
-        _global_project_root = path
+def get_project_root_resolved():
+    """Get the resolved project root for the current context."""
+    roots = _project_root_var.get()
+    return roots[1] if roots is not None else None
+
+
+def set_project_root(path: pathlib.Path, resolved_path: pathlib.Path = None):
+    """Set the project root for the current context (and threads/tasks started from it).
+
+    The root is resolved here once (unless the caller already has it resolved)
+    so path checks in the tools don't re-resolve it on every call.
+    """
+    _project_root_var.set((path, resolved_path if resolved_path is not None else path.resolve()))
+
+
+def threaded_tool(func: Callable) -> StructuredTool:
+    """Like @tool, but also gives the tool an async variant that runs the blocking body in a worker thread."""
+    @functools.wraps(func)
+    async def coroutine(*args, **kwargs):
+        # to_thread copies the current context, so the worker thread sees the project root
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    return StructuredTool.from_function(func=func, coroutine=coroutine)
+
+
+def with_coroutine(coroutine: Callable) -> Callable[[Callable], StructuredTool]:
+    """Like @tool, but uses the given native coroutine as the tool's async variant."""
+    def decorator(func: Callable) -> StructuredTool:
+        return StructuredTool.from_function(func=func, coroutine=coroutine, name=func.__name__)
+    return decorator
+
+
+def scan_highest_serial_id(base_path: pathlib.Path) -> int:
+    """Returns the highest serial ID among existing generated_project_N directories, or 0."""
+    highest = 0
+    with os.scandir(base_path) as entries:
+        for entry in entries:
+            match = PROJECT_DIR_PATTERN.match(entry.name)
+            if match and entry.is_dir():
+                highest = max(highest, int(match.group(1)))
+    return highest
 
 
 def get_next_serial_id() -> int:
-    """Finds the next available serial ID by checking existing project directories."""
+    """Reserves the next project serial ID from a counter file in the working directory.
+
+    The directory is scanned only the first time, when the counter file doesn't exist
+    yet. The file is locked while it is updated, so concurrent builds (threads or
+    worker processes) never get the same ID.
+    """
     base_path = pathlib.Path.cwd()
-    existing_dirs = [d for d in base_path.glob("generated_project_*") if d.is_dir()]
-    
-    if not existing_dirs:
-        return 1
-    
-    # Extract serial IDs from existing directories
-    serial_ids = []
-    for d in existing_dirs:
-        try:
-            # Extract number from "generated_project_X" format
-            serial_id = int(d.name.split("_")[-1])
-            serial_ids.append(serial_id)
-        except (ValueError, IndexError):
-            continue
-    
-    return max(serial_ids) + 1 if serial_ids else 1
+    fd = os.open(base_path / SERIAL_COUNTER_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)  # Released when fd is closed
+        raw = os.read(fd, 32).strip()
+        serial_id = int(raw) if raw else scan_highest_serial_id(base_path) + 1
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(serial_id + 1).encode())
+    finally:
+        os.close(fd)
+    return serial_id
+
+
+def walk_project_files(root: pathlib.Path) -> List[str]:
+    """Returns every file under root as a path relative to root, using one os.scandir walk."""
+    files = []
+    stack = [("", str(root))]
+    while stack:
+        prefix, directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                rel_path = os.path.join(prefix, entry.name) if prefix else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((rel_path, entry.path))
+                elif entry.is_file():
+                    files.append(rel_path)
+    return sorted(files)
 
 
 def safe_path_for_project(path: str) -> pathlib.Path:
     """Security function that prevents path traversal attacks."""
-    PROJECT_ROOT = get_project_root()
+    root = get_project_root_resolved()
     
-    if PROJECT_ROOT is None:
+    if root is None:
         raise RuntimeError("PROJECT_ROOT not initialized. Call init_project_root() first.")
     
     # Strip leading slashes - treat all paths as relative to project root
     path = path.lstrip('/')
     
-    # Build the full path relative to project root
-    p = (PROJECT_ROOT / path).resolve()
-    root = PROJECT_ROOT.resolve()
+    # Build the full path relative to the (already resolved) project root
+    root_str = str(root)
+    resolved = os.path.realpath(os.path.join(root_str, path))
     
-    # Check if resolved path is within project root
-    try:
-        p.relative_to(root)
-    except ValueError:
+    # Check if resolved path is within project root: one prefix test, no Path objects
+    if resolved != root_str and not resolved.startswith(root_str + os.sep):
         raise ValueError(f"Attempt to write outside project root: {path}")
     
-    return p
+    return pathlib.Path(resolved)
 
 
-@tool
-def write_file(path: str, content: str) -> str:
-    """Writes content to a file at the specified path within the project root."""
+WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+
+
+def write_project_file(path: str, content: str) -> pathlib.Path:
+    """Atomically writes content to a file within the project root and returns its resolved path.
+
+    The bytes go to a temp file in one unbuffered write and are moved into place
+    with os.replace, so a crash never leaves a half-written file behind.
+    """
     try:
         p = safe_path_for_project(path)
-        p.parent.mkdir(parents=True, exist_ok=True)
-        with open(p, "w", encoding="utf-8") as f:
-            f.write(content)
-        logger.info(f"✓ Successfully wrote file: {p}")
-        return f"WROTE:{p}"
+        data = content.encode("utf-8")
+        # Unique per writer, so parallel coder branches never share a temp file
+        tmp = p.with_name(f".{p.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            fd = os.open(tmp, WRITE_FLAGS, 0o644)
+        except FileNotFoundError:
+            # Only create parent directories when they are actually missing
+            p.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(tmp, WRITE_FLAGS, 0o644)
+        try:
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            os.replace(tmp, p)
+        except BaseException:
+            # A failed write (e.g. disk full) or replace must not leave the temp file behind
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        logger.info("✓ Successfully wrote file: %s", p)
+        return p
     except RuntimeError as e:
-        logger.error(f"✗ Failed to write {path}: {e}")
+        logger.error("✗ Failed to write %s: %s", path, e)
         raise
 
 
-@tool
+@threaded_tool
+def write_file(path: str, content: str) -> str:
+    """Writes content to a file at the specified path within the project root."""
+    return f"WROTE:{write_project_file(path, content)}"
+
+
+@functools.lru_cache(maxsize=64)
+def read_project_file(path: str, mtime_ns: int, size: int, inode: int) -> str:
+    """Reads and decodes a file in one shot; the stat fields in the key make any rewrite a cache miss."""
+    return pathlib.Path(path).read_bytes().decode("utf-8")
+
+
+@threaded_tool
 def read_file(path: str) -> str:
     """Reads content from a file at the specified path within the project root."""
     p = safe_path_for_project(path)
-    if not p.exists():
+    try:
+        st = p.stat()
+    except FileNotFoundError:
         return ""
-    with open(p, "r", encoding="utf-8") as f:
-        return f.read()
+    return read_project_file(str(p), st.st_mtime_ns, st.st_size, st.st_ino)
 
 
-@tool
+@threaded_tool
 def get_current_directory() -> str:
     """Returns the current working directory."""
     PROJECT_ROOT = get_project_root()
@@ -125,47 +221,108 @@ def get_current_directory() -> str:
     return str(PROJECT_ROOT)
 
 
-@tool
+@threaded_tool
 def list_files(directory: str = ".") -> str:
     """Lists all files in the specified directory within the project root."""
-    PROJECT_ROOT = get_project_root()
-    if PROJECT_ROOT is None:
+    root = get_project_root_resolved()
+    if root is None:
         raise RuntimeError("PROJECT_ROOT not initialized.")
     
     p = safe_path_for_project(directory)
     if not p.is_dir():
         return f"ERROR: {p} is not a directory"
     
-    files = [str(f.relative_to(PROJECT_ROOT)) for f in p.glob("**/*") if f.is_file()]
+    # scandir walk: no Path object or stat call per entry
+    prefix = os.path.relpath(p, root)
+    files = walk_project_files(p)
+    if prefix != ".":
+        files = [os.path.join(prefix, f) for f in files]
     return "\n".join(files) if files else "No files found."
 
 
-@tool
-def run_cmd(cmd: str, cwd: str = None, timeout: int = 30) -> Tuple[int, str, str]:
-    """Runs a shell command in the specified directory and returns the result."""
+def command_cwd(cwd: str = None) -> pathlib.Path:
+    """Returns the directory a command runs in: cwd within the project root, or the root itself."""
     PROJECT_ROOT = get_project_root()
     if PROJECT_ROOT is None:
         raise RuntimeError("PROJECT_ROOT not initialized.")
-    
-    cwd_dir = safe_path_for_project(cwd) if cwd else PROJECT_ROOT
+    return safe_path_for_project(cwd) if cwd else PROJECT_ROOT
+
+
+def command_argv(cmd: str) -> List[str]:
+    """Splits cmd into an argv list for running without a shell."""
+    argv = shlex.split(cmd)
+    if not argv:
+        raise ValueError("Command is empty")
+    return argv
+
+
+def run_process(cmd: str, cwd: str, timeout: int, shell: bool) -> Tuple[int, str, str]:
+    """Runs cmd directly (argv from shlex.split) or through /bin/sh and returns (returncode, stdout, stderr)."""
     res = subprocess.run(
-        cmd, 
-        shell=True, 
-        cwd=str(cwd_dir), 
-        capture_output=True, 
-        text=True, 
+        cmd if shell else command_argv(cmd),
+        shell=shell,
+        cwd=str(command_cwd(cwd)),
+        capture_output=True,
         timeout=timeout
     )
-    return res.returncode, res.stdout, res.stderr
+    # Raw bytes decoded once, skipping the text-mode newline translation
+    return res.returncode, res.stdout.decode(errors="replace"), res.stderr.decode(errors="replace")
+
+
+async def arun_process(cmd: str, cwd: str, timeout: int, shell: bool) -> Tuple[int, str, str]:
+    """Async variant of run_process: waits on the subprocess without blocking the event loop."""
+    cwd_dir = str(command_cwd(cwd))
+    if shell:
+        proc = await asyncio.create_subprocess_shell(
+            cmd, cwd=cwd_dir, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    else:
+        proc = await asyncio.create_subprocess_exec(
+            *command_argv(cmd), cwd=cwd_dir, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return proc.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+
+async def arun_cmd(cmd: str, cwd: str = None, timeout: int = 30) -> Tuple[int, str, str]:
+    """Async variant of run_cmd."""
+    return await arun_process(cmd, cwd, timeout, shell=False)
+
+
+@with_coroutine(arun_cmd)
+def run_cmd(cmd: str, cwd: str = None, timeout: int = 30) -> Tuple[int, str, str]:
+    """Runs a command (no shell; use run_shell for pipes, && or redirects) in the specified directory and returns the result."""
+    return run_process(cmd, cwd, timeout, shell=False)
+
+
+async def arun_shell(cmd: str, cwd: str = None, timeout: int = 30) -> Tuple[int, str, str]:
+    """Async variant of run_shell."""
+    return await arun_process(cmd, cwd, timeout, shell=True)
+
+
+@with_coroutine(arun_shell)
+def run_shell(cmd: str, cwd: str = None, timeout: int = 30) -> Tuple[int, str, str]:
+    """Runs a shell command line (pipes, &&, redirects) in the specified directory and returns the result."""
+    return run_process(cmd, cwd, timeout, shell=True)
 
 
 def init_project_root():
     """Initializes a new project root directory with a unique serial ID."""
-    serial_id = get_next_serial_id()
-    project_path = pathlib.Path.cwd() / f"generated_project_{serial_id}"
-    project_path.mkdir(parents=True, exist_ok=True)
+    while True:
+        serial_id = get_next_serial_id()
+        project_path = pathlib.Path.cwd() / f"generated_project_{serial_id}"
+        try:
+            project_path.mkdir(parents=True)
+            break
+        except FileExistsError:
+            continue  # Counter file was reset or edited; skip IDs already on disk
     
-    # Set the project root for the current thread
+    # Set the project root for the current context
     set_project_root(project_path)
     
     return project_path  # Return Path object, not string
\ No newline at end of file
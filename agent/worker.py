@@ -0,0 +1,180 @@
+# =============================================================================
+# BUILD WORKER MODULE
+# =============================================================================
+# This module runs agent builds outside the API process using arq.
+# Maps to: The execution side of the job queue - the API enqueues
+# "run_agent_task" jobs in Redis and worker processes pick them up.
+#
+# Start a worker with:
+#   arq agent.worker.WorkerSettings
+#
+# Scale by starting more worker processes (on hosts sharing the same
+# working directory, since projects are generated under it).
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Tuple
+
+from arq.connections import RedisSettings
+
+from agent import storage
+from agent.graph import agent, fetch_review_batch
+from agent.tools import init_project_root, set_project_root, walk_project_files
+
+logger = logging.getLogger(__name__)
+
+# Builds running at once in one worker process; extra jobs wait in the queue
+MAX_CONCURRENT_BUILDS = int(os.getenv("MAX_CONCURRENT_BUILDS", "4"))
+
+# Coder branches (one per generated file) running at once within a build
+CODER_MAX_CONCURRENCY = int(os.getenv("CODER_MAX_CONCURRENCY", "8"))
+
+# Submit reviews through the OpenAI Batch API (50% cheaper, results within 24h)
+REVIEW_BATCH_MODE = os.getenv("REVIEW_BATCH_MODE", "").lower() in ("1", "true", "yes")
+
+# How often a deferred review's batch is checked until OpenAI finishes it
+REVIEW_BATCH_POLL_SECONDS = int(os.getenv("REVIEW_BATCH_POLL_SECONDS", "300"))
+BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# Upper bound for a single build before arq cancels it
+BUILD_TIMEOUT_SECONDS = int(os.getenv("BUILD_TIMEOUT_SECONDS", "3600"))
+
+
+def run_agent(user_prompt: str, project_path: Path) -> Tuple[list, dict]:
+    """Runs the agent graph in a worker thread and returns the generated file list and final state"""
+    # Set in this thread's context; graph nodes and tools inherit it through context-copying executors
+    set_project_root(project_path)
+
+    # Run the agent with project_root in initial state
+    final_state = agent.invoke(
+        {
+            "user_prompt": user_prompt,
+            "project_root": str(project_path),
+            "batch_mode": REVIEW_BATCH_MODE
+        },
+        {"recursion_limit": 100, "max_concurrency": CODER_MAX_CONCURRENCY}
+    )
+
+    # Get list of generated files once; the API serves it from storage afterwards
+    if not project_path.exists():
+        return [], final_state
+    return walk_project_files(project_path), final_state
+
+
+async def run_agent_task(ctx: dict, task_id: str, user_prompt: str):
+    """arq job that executes the agent and records the result in task storage"""
+    executor: ThreadPoolExecutor = ctx["agent_executor"]
+    loop = asyncio.get_running_loop()
+    try:
+        if not await storage.update_task(task_id, status="processing", progress="planner"):
+            logger.info("Task %s was deleted before it started, skipping the build", task_id)
+            return
+
+        logger.info("Starting task %s", task_id)
+
+        # Initialize project root
+        project_path = await loop.run_in_executor(executor, init_project_root)  # Now returns Path object
+        logger.info("Initialized project directory: %s", project_path)
+
+        # Update progress
+        await storage.update_task(task_id, progress="architect")
+
+        # The agent is blocking, so it runs on the build executor
+        files, final_state = await loop.run_in_executor(executor, run_agent, user_prompt, project_path)
+        review_batch_id = final_state.get("review_batch_id")
+
+        # Update task status (a no-op if the task was deleted during the build)
+        recorded = await storage.finish_task(
+            task_id,
+            status="completed",
+            progress="done",
+            project_path=str(project_path),
+            resolved_project_path=str(project_path.resolve()),
+            files=files,
+            completed_at=storage.now_iso(),
+            review=None if review_batch_id else final_state.get("review"),
+            review_batch_id=review_batch_id,
+            review_status="pending" if review_batch_id else None
+        )
+        
+        # The deferred review is fetched by a follow-up job once its batch finishes
+        if review_batch_id and recorded:
+            await ctx["redis"].enqueue_job(
+                "poll_review_batch", task_id, review_batch_id, _defer_by=REVIEW_BATCH_POLL_SECONDS
+            )
+
+        logger.info("Task %s completed successfully", task_id)
+
+    except asyncio.CancelledError:
+        # arq cancels the job on BUILD_TIMEOUT_SECONDS or worker shutdown; record it
+        # so the task doesn't stay "processing" forever, then let the cancel propagate
+        logger.error("Task %s cancelled (timeout or worker shutdown)", task_id)
+        await storage.finish_task(
+            task_id,
+            status="failed",
+            error="Build cancelled (timed out or the worker shut down)",
+            completed_at=storage.now_iso()
+        )
+        raise
+
+    except Exception as e:
+        logger.error("Task %s failed: %s", task_id, e, exc_info=True)
+        await storage.finish_task(
+            task_id,
+            status="failed",
+            error=str(e),
+            completed_at=storage.now_iso()
+        )
+
+
+async def poll_review_batch(ctx: dict, task_id: str, batch_id: str):
+    """arq job that checks a deferred review's batch and stores the review once it has finished"""
+    if await storage.get_task(task_id) is None:
+        logger.info("Task %s is gone, no longer polling review batch %s", task_id, batch_id)
+        return
+    
+    loop = asyncio.get_running_loop()
+    try:
+        status, review = await loop.run_in_executor(None, fetch_review_batch, batch_id)
+    except Exception as e:
+        logger.warning("Could not check review batch %s: %s", batch_id, e)
+        status, review = None, None
+    
+    if status not in BATCH_FINAL_STATUSES:
+        await ctx["redis"].enqueue_job(
+            "poll_review_batch", task_id, batch_id, _defer_by=REVIEW_BATCH_POLL_SECONDS
+        )
+        return
+    
+    await storage.update_task(task_id, review_status=status, review=review)
+    logger.info("Review batch %s for task %s finished: %s", batch_id, task_id, status)
+
+
+async def startup(ctx: dict):
+    """Create the thread pool that runs blocking agent builds"""
+    ctx["agent_executor"] = ThreadPoolExecutor(
+        max_workers=MAX_CONCURRENT_BUILDS,
+        thread_name_prefix="agent-build"
+    )
+    logger.info("Build worker started, max concurrent builds: %d", MAX_CONCURRENT_BUILDS)
+
+
+async def shutdown(ctx: dict):
+    """Release the build thread pool and the storage connection pool"""
+    ctx["agent_executor"].shutdown(wait=True)
+    await storage.redis_client.aclose()
+
+
+class WorkerSettings:
+    """arq worker configuration"""
+    functions = [run_agent_task, poll_review_batch]
+    on_startup = startup
+    on_shutdown = shutdown
+    redis_settings = RedisSettings.from_dsn(storage.REDIS_URL)
+    max_jobs = MAX_CONCURRENT_BUILDS
+    job_timeout = BUILD_TIMEOUT_SECONDS
+    # Builds write into fresh project directories, so don't re-run them on failure
+    max_tries = 1